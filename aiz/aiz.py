@@ -2,12 +2,17 @@
 
 import argparse
 import sys
-from aiz.hwinfo import DetectHardware, PrintHardwareInfo, gpuDevices, DisplayStats
-from time import sleep
+from aiz.hwinfo import DetectHardware, PrintHardwareInfo, gpuDevices, StartSampler, WaitForChange, DisplayStats, ReleaseHardware
 import curses
 
 __version__ = '0.3.1'
 
+# Time between two samples, in seconds
+REFRESH_PERIOD = 0.01
+# Longest time between two frames when no displayed value changes, in seconds.
+# This is also how often the graphs scroll while the readings are steady.
+IDLE_REDRAW_PERIOD = 0.5
+
 
 def ParseCmdLine(argv):
     parser = argparse.ArgumentParser()
@@ -30,6 +35,7 @@ def DisplayMenu(win):
 
 def Shutdown(win):
     curses.endwin()
+    ReleaseHardware()
     sys.exit(0)
 
 def MainLoop(win):
@@ -41,19 +47,24 @@ def MainLoop(win):
     #COLOR_CYAN
     curses.init_pair(1, curses.COLOR_GREEN, curses.COLOR_BLACK)
     curses.noecho()
+    # Stay in cbreak mode so key presses make stdin readable without Enter
+    curses.cbreak()
     win.nodelay(True)
 
+    StartSampler(REFRESH_PERIOD)
+    stdin = sys.stdin.fileno()
     while(True):
-        sleep(0.01)
-        win.clear()
+        # Sleep until a displayed value changes or there is a key to handle. Key
+        # presses are handled right away instead of on the next tick, at the
+        # cost of a frame per key press.
+        WaitForChange(IDLE_REDRAW_PERIOD, [stdin])
+        win.erase()
      
         DisplayStats(win, curses)
 
         DisplayMenu(win)
 
-        curses.cbreak()
         key = win.getch()
-        curses.nocbreak()
         if key == 113:
             Shutdown(win)
 
@@ -0,0 +1,14 @@
+# Ahead-of-time build of the aiz.kernels kernels with numba.pycc, so importing aiz
+# loads native code instead of paying for JIT compilation on the first frame.
+# setup.py adds the extension when AIZ_USE_NUMBA_AOT=1 is set.
+# `python -m aiz.build_aot` from the source tree builds it in place. Running the
+# file as a script does not work, because aiz/aiz.py then shadows the package.
+from numba.pycc import CC
+from aiz.kernels import KERNELS
+
+cc = CC('fast_aot')
+for name, (kernel, signature) in KERNELS.items():
+    cc.export(name, signature)(kernel)
+
+if __name__ == '__main__':
+    cc.compile()
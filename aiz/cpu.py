@@ -1,5 +1,6 @@
 from cpuinfo import get_cpu_info
 import psutil
+from aiz.history import SampleHistory
 
 
 class AIZCPU:
@@ -17,13 +18,15 @@ class AIZCPU:
         self.num_cores = self.num_threads / 2
         self.memory = float(psutil.virtual_memory().total) / 1024.0 / 1024.0
         self.MAX_SAMPLES = 100
-        self.cpu_usage = [0] * self.MAX_SAMPLES
-        self.mem_usage = [0] * self.MAX_SAMPLES
+        self.cpu_usage = SampleHistory(self.MAX_SAMPLES)
+        self.mem_usage = SampleHistory(self.MAX_SAMPLES)
+        # cpu_percent() reports usage since its previous call, so take the
+        # baseline now for the first sample to cover the time since detection
+        psutil.cpu_percent()
 
     def Sample(self):
         cpuStat = psutil.cpu_percent()
-        self.cpu_usage.append(cpuStat)
-        self.cpu_usage = self.cpu_usage[1:len(self.cpu_usage)]
+        self.cpu_usage.Append(cpuStat)
 
 
 def GetCPUDevice():
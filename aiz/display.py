@@ -0,0 +1,32 @@
+# Per-frame drawing helpers. Kept free of hardware state and fully annotated
+# so they can be compiled with mypyc (see setup.py).
+from typing import Any, Iterable
+
+from sparklines import sparklines  # type: ignore
+
+# Format of every value drawn on each frame, with a same-width placeholder
+# drawn instead when the reading is missing
+FORMATS = {
+    'percent': ('%3d %%  ', '  - %  '),
+    'bandwidth': ('%3d MB/s', '  - MB/s'),
+    'temp': ('%3.0f C', '  - C'),
+    'fan': ('%2.0f %%', ' - %'),
+    'util': ('%3.0f %%', '  - %'),
+}
+
+
+def FormatValue(value: float, kind: str) -> str:
+    fmt, missing = FORMATS[kind]
+    # NaN marks a missing reading and is the only value not equal to itself
+    if value != value:
+        return missing
+    return fmt % value
+
+
+def DrawGraph(win: Any, color: int, title: str, data: Iterable[float], label: str, maximum: float = 100) -> None:
+    line = sparklines(data, num_lines=2, minimum=0, maximum=maximum)
+    win.addstr(title)
+    win.addstr(line[0], color)
+    win.addch('\n')
+    win.addstr(label)
+    win.addstr(line[1], color)
@@ -0,0 +1,21 @@
+# Numeric kernels applied to every sample. They are loaded from the extension
+# built ahead of time by build_aot.py when it is installed, compiled with Numba
+# when AIZ_USE_NUMBA=1 is set, and run as plain NumPy otherwise. The kernels
+# only ever see a handful of GPUs, so plain NumPy is fast enough and avoids
+# importing Numba and compiling at startup.
+import os
+
+import numpy as np
+
+try:
+    # The ahead-of-time extension does not need Numba at run time
+    from aiz.fast_aot import ExponentialAverage
+except ImportError:
+    from aiz.kernels import ExponentialAverage
+
+    if os.environ.get('AIZ_USE_NUMBA') == '1':
+        from numba import njit
+        ExponentialAverage = njit(cache=True)(ExponentialAverage)
+        # Compile now rather than on the first frame. With cache=True this
+        # only costs a cache lookup after the first run.
+        ExponentialAverage(np.zeros(1), np.zeros(1), 0.5)
@@ -7,6 +7,7 @@
 import os
 import re
 import logging
+from aiz.history import SampleHistory
 
 
 
@@ -117,17 +118,25 @@ def listAmdHwMons():
                     hwmons.append(os.path.join(hwmonprefix, mon))
     return hwmons
 
+# HW Monitor of each DRM device, which never changes while the device is present
+hwmonCache = {}
+
 def getHwmonFromDevice(device):
     """ Return the corresponding HW Monitor for a specified GPU device.
+    The lookup scans every HW Monitor, so the result is cached per device.
 
     Parameters:
     device -- DRM device identifier
     """
+    if device in hwmonCache:
+        return hwmonCache[device]
     drmdev = os.path.realpath(os.path.join(drmprefix, device, 'device'))
+    hwmonCache[device] = None
     for hwmon in listAmdHwMons():
         if os.path.realpath(os.path.join(hwmon, 'device')) == drmdev:
-            return hwmon
-    return None
+            hwmonCache[device] = hwmon
+            break
+    return hwmonCache[device]
 
 def getFilePath(device, key):
     """ Return the filepath for a specific device and key
@@ -170,7 +179,6 @@ def getSysfsValue(device, key):
     key -- [$valuePaths.keys()] Key referencing desired SysFS file
     """
     filePath = getFilePath(device, key)
-    pathDict = valuePaths[key]
 
     if not filePath:
         return None
@@ -183,6 +191,67 @@ def getSysfsValue(device, key):
         logging.warning('GPU[%s]\t: Unable to read %s', parseDeviceName(device), filePath)
         return None
 
+    return finishSysfsValue(device, key, fileValue)
+
+def openSysfsFile(device, key):
+    """ Open the SysFS file for a specified device and return its file
+    descriptor, or None if the file is unavailable
+
+    Parameters:
+    device -- DRM device identifier
+    key -- [$valuePaths.keys()] Key referencing desired SysFS file
+    """
+    filePath = getFilePath(device, key)
+    if not filePath:
+        return None
+    try:
+        return os.open(filePath, os.O_RDONLY)
+    except OSError:
+        logging.warning('GPU[%s]\t: Unable to open %s', parseDeviceName(device), filePath)
+        return None
+
+def readSysfsFile(device, key, fd):
+    """ Return the desired SysFS value from a file descriptor returned by
+    openSysfsFile. The file is re-read from offset 0 so the descriptor can be
+    reused on every sample instead of re-opening the file.
+
+    Parameters:
+    device -- DRM device identifier
+    key -- [$valuePaths.keys()] Key referencing desired SysFS file
+    fd -- File descriptor of the opened SysFS file
+    """
+    rawValue = readSysfsBytes(device, key, fd)
+    if rawValue is None:
+        return None
+
+    return finishSysfsValue(device, key, rawValue.decode().rstrip('\n'))
+
+def readSysfsBytes(device, key, fd):
+    """ Return the raw bytes of a SysFS file from a file descriptor returned by
+    openSysfsFile, without decoding or parsing them. int() and float() accept
+    bytes with a trailing newline, so numeric values can be parsed directly.
+
+    Parameters:
+    device -- DRM device identifier
+    key -- [$valuePaths.keys()] Key referencing desired SysFS file
+    fd -- File descriptor of the opened SysFS file
+    """
+    try:
+        return os.pread(fd, 4096, 0)
+    except OSError:
+        logging.warning('GPU[%s]\t: Unable to read %s', parseDeviceName(device), key)
+        return None
+
+def finishSysfsValue(device, key, fileValue):
+    """ Parse a raw SysFS value read for a specified device and key
+
+    Parameters:
+    device -- DRM device identifier
+    key -- [$valuePaths.keys()] Key referencing desired SysFS file
+    fileValue -- Raw SysFS value with the trailing newline stripped
+    """
+    pathDict = valuePaths[key]
+
     # Some sysfs files aren't a single line of text
     if pathDict['needsparse']:
         fileValue = parseSysfsValue(key, fileValue)
@@ -268,61 +337,77 @@ def getMemInfo(device, memType):
 
 
 class AIZGPU_AMD:
+    # SysFS files read on every Sample() are kept open for the device lifetime
+    SAMPLED_KEYS = ('perf', 'fan', 'use', 'vram_used', 'pcie_bw', 'temp1')
+
     def __init__(self, device_id):
         self.device = device_id
         self.id = getSysfsValue(self.device, 'id')
+        self.fds = {}
+        for key in self.SAMPLED_KEYS:
+            fd = openSysfsFile(self.device, key)
+            if fd is not None:
+                self.fds[key] = fd
         self.name = device_id # TODO FIX name
         self.MAX_SAMPLES = 100
-        self.gpu_usage = [0] * self.MAX_SAMPLES
-        self.vram_usage = [0] * self.MAX_SAMPLES
-        self.vram_total = 0
-        self.pcie_bw = [0] * self.MAX_SAMPLES
+        self.gpu_usage = SampleHistory(self.MAX_SAMPLES)
+        self.vram_usage = SampleHistory(self.MAX_SAMPLES)
+        self.pcie_bw = SampleHistory(self.MAX_SAMPLES)
         self.perf = 0
         self.fan = 0
-        self.fanmax = 0
         self.temp = 0
+        # Static values are read once instead of on every sample
+        self.vram_total = getSysfsValue(self.device, 'vram_total')
+        self.fanMax = getSysfsValue(self.device, 'fanmax')
         self.Sample()
 
     def GetName(self):
         return self.name
 
+    def GetValue(self, key):
+        fd = self.fds.get(key)
+        if fd is None:
+            return None
+        return readSysfsFile(self.device, key, fd)
+
+    def GetRawValue(self, key):
+        fd = self.fds.get(key)
+        if fd is None:
+            return None
+        return readSysfsBytes(self.device, key, fd)
+
+    def Close(self):
+        for fd in self.fds.values():
+            os.close(fd)
+        self.fds = {}
+
     def Sample(self):
-        self.perf = getSysfsValue(self.device, 'perf')
-        self.fan = getSysfsValue(self.device, 'fan')
-        self.temp = getSysfsValue(self.device, 'fan')
+        self.perf = self.GetValue('perf')
 
         # GPU usage
-        self.gpu_usage.append(int(getSysfsValue(self.device, 'use')))
-        self.gpu_usage = self.gpu_usage[1:len(self.gpu_usage)]
+        self.gpu_usage.Append(int(self.GetRawValue('use')))
 
         # VRAM usage
-        memInfo = getMemInfo(self.device, 'vram')
-        mem_use = '% 3.0f' % (100*(float(memInfo[0])/float(memInfo[1])))
-        self.vram_total = memInfo[1]
-        self.vram_usage.append(int(mem_use))
-        self.vram_usage = self.vram_usage[1:len(self.vram_usage)]
+        vram_used = int(self.GetRawValue('vram_used'))
+        self.vram_usage.Append(int(round(100 * vram_used / float(self.vram_total))))
 
         # PCIE usage
-        fsvals = getSysfsValue(self.device, 'pcie_bw')
         # The sysfs file returns 3 integers: bytes-received, bytes-sent, maxsize
         # Multiply the number of packets by the maxsize to estimate the PCIe usage
-        received = int(fsvals.split()[0])
-        sent = int(fsvals.split()[1])
-        mps = int(fsvals.split()[2])
+        received, sent, mps = self.GetRawValue('pcie_bw').split()[:3]
         # Use 1024.0 to ensure that the result is a float and not integer division
-        bw = ((received + sent) * mps) / 1024.0 / 1024.0
-        self.pcie_bw.append(float(bw))
-        self.pcie_bw = self.pcie_bw[1:len(self.pcie_bw)]
+        bw = ((int(received) + int(sent)) * int(mps)) / 1024.0 / 1024.0
+        self.pcie_bw.Append(bw)
 
         # Fan speed %
-        fanLevel = getSysfsValue(self.device, 'fan')
-        self.fanMax = getSysfsValue(self.device, 'fanmax')
+        fanLevel = self.GetRawValue('fan')
+        self.fan = None
         if fanLevel and self.fanMax:
-            self.fan = (float(fanLevel) / float(self.fanMax)) * 100
-            #self.fan = fanLevel
+            self.fan = (int(fanLevel) / float(self.fanMax)) * 100
 
-        # Temperature
-        self.temp = getSysfsValue(self.device, 'temp1')
+        # Temperature, in millidegrees
+        temp = self.GetRawValue('temp1')
+        self.temp = int(temp) / 1000 if temp else None
 
 
 def ListAMDGPUDevices(showall):
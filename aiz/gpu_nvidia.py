@@ -1,4 +1,6 @@
 from py3nvml.py3nvml import *
+from aiz.nvml_gpm import IsGpmSupported, GpmSampler
+from aiz.history import SampleHistory
 
 
 class AIZGPU_NVIDIA:
@@ -7,30 +9,45 @@ class AIZGPU_NVIDIA:
 
         self.name = nvmlDeviceGetName(self.device)
         self.MAX_SAMPLES = 100
-        self.gpu_usage = [0] * 100
-        self.vram_usage = [0] * self.MAX_SAMPLES
+        self.gpu_usage = SampleHistory(self.MAX_SAMPLES)
+        self.vram_usage = SampleHistory(self.MAX_SAMPLES)
         self.vram_total = nvmlDeviceGetMemoryInfo(self.device).total
-        self.pcie_bw = [0] * self.MAX_SAMPLES
+        self.pcie_bw = SampleHistory(self.MAX_SAMPLES)
         self.pcie_gen = nvmlDeviceGetMaxPcieLinkGeneration(self.device)
         self.pcie_width = nvmlDeviceGetMaxPcieLinkWidth(self.device)
         self.perf = 0
         self.temp = 0
         self.fan = 0
+        # Hopper and newer GPUs report all GPM metrics with a single call
+        self.gpm = None
+        self.gpm_metrics = None
+        if IsGpmSupported(self.device):
+            try:
+                self.gpm = GpmSampler(self.device)
+            except NVMLError:
+                pass
         self.Sample()
 
     def Sample(self):
         nv_util = nvmlDeviceGetUtilizationRates(self.device)
-        self.gpu_usage.append(int(nv_util.gpu))
-        self.gpu_usage = self.gpu_usage[1:len(self.gpu_usage)]
+        self.gpu_usage.Append(int(nv_util.gpu))
 
-        self.vram_usage.append(nvmlDeviceGetMemoryInfo(self.device).used / float(self.vram_total) * 100)
-        self.vram_usage = self.vram_usage[1:len(self.vram_usage)]
+        self.vram_usage.Append(nvmlDeviceGetMemoryInfo(self.device).used / float(self.vram_total) * 100)
 
-        pcie_usage = nvmlDeviceGetPcieThroughput(self.device, NVML_PCIE_UTIL_TX_BYTES) + nvmlDeviceGetPcieThroughput(self.device, NVML_PCIE_UTIL_RX_BYTES)
-        pcie_usage = pcie_usage / (1024.0)
-        #print(pcie_tx_usage)
-        self.pcie_bw.append(pcie_usage)
-        self.pcie_bw = self.pcie_bw[1:len(self.pcie_bw)]
+        if self.gpm:
+            try:
+                self.gpm_metrics = self.gpm.Sample()
+            except NVMLError:
+                self.DisableGpm()
+
+        gpm = self.gpm_metrics
+        if gpm and gpm['pcie_tx'] is not None and gpm['pcie_rx'] is not None:
+            # GPM traffic is averaged over the whole sample interval, in MiB/s
+            pcie_usage = gpm['pcie_tx'] + gpm['pcie_rx']
+        else:
+            pcie_usage = nvmlDeviceGetPcieThroughput(self.device, NVML_PCIE_UTIL_TX_BYTES) + nvmlDeviceGetPcieThroughput(self.device, NVML_PCIE_UTIL_RX_BYTES)
+            pcie_usage = pcie_usage / (1024.0)
+        self.pcie_bw.Append(pcie_usage)
 
         self.temp = nvmlDeviceGetTemperature(self.device, NVML_TEMPERATURE_GPU)
         try:
@@ -38,6 +55,21 @@ class AIZGPU_NVIDIA:
         except:
             self.fan = 0
 
+    def DisableGpm(self):
+        # GPM is optional: a device that reports support but then rejects
+        # GPM calls (in MIG mode for instance) falls back to the PCIe
+        # throughput counters instead of failing
+        try:
+            self.gpm.Close()
+        except NVMLError:
+            pass
+        self.gpm = None
+        self.gpm_metrics = None
+
+    def Close(self):
+        if self.gpm:
+            self.DisableGpm()
+
 
 
 def ListNVIDIAGPUDevices():
@@ -52,3 +84,10 @@ def ListNVIDIAGPUDevices():
         gpus = []
         
     return gpus
+
+
+def ShutdownNVIDIAGPUDevices():
+    try:
+        nvmlShutdown()
+    except:
+        pass
@@ -0,0 +1,41 @@
+import threading
+
+import numpy as np
+
+
+class SampleHistory:
+    """ Fixed number of past samples of one metric, kept in a preallocated
+    ring buffer so recording a sample neither allocates nor shifts the others.
+    Empty slots read as 0, like the lists this replaces.
+
+    The sampler thread appends while the UI thread reads, so both hold the
+    lock for the few operations that touch the buffer.
+    """
+    def __init__(self, size):
+        self.buffer = np.zeros(size)
+        self.index = 0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def Append(self, value):
+        with self.lock:
+            self.buffer[self.index] = value
+            self.index = (self.index + 1) % len(self.buffer)
+            self.count = min(self.count + 1, len(self.buffer))
+
+    def Latest(self):
+        return self.buffer[self.index - 1]
+
+    def Values(self):
+        # Copy of every sample, from the oldest to the newest
+        with self.lock:
+            return np.concatenate((self.buffer[self.index:], self.buffer[:self.index]))
+
+    def Recorded(self):
+        # Slots are filled from the start, so until the buffer wraps around
+        # the recorded samples are the first count ones
+        return self.buffer[:self.count]
+
+    def Max(self):
+        with self.lock:
+            return float(np.max(self.Recorded())) if self.count else 0.0
@@ -1,25 +1,232 @@
 import os
 import re
+import select
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from math import sin, pi
+from time import monotonic
 import sys
 from aiz.gpu_amd import ListAMDGPUDevices
-from aiz.gpu_nvidia import ListNVIDIAGPUDevices
+from aiz.gpu_nvidia import ListNVIDIAGPUDevices, ShutdownNVIDIAGPUDevices
 from aiz.cpu import GetCPUDevice
-from sparklines import sparklines
+from aiz.display import DrawGraph, FormatValue
+from aiz.fast import ExponentialAverage
 
 
 gpuDevices = []
 cpuDevice = None
+# Name of every GPU, collected once when the hardware is detected
+gpuNames = []
+# Weight of the newest sample in the displayed PCIe bandwidth, which is too
+# noisy to read when shown raw at every sample
+PCIE_SMOOTHING = 0.1
+# Latest readings of every device. GPU readings are parallel arrays indexed like
+# gpuDevices. The sampler thread replaces the whole dict on every sample, so a
+# reader holding a reference never sees a partially updated sample. Histories
+# are not part of it: they are only copied by GetLatestStats when a frame is
+# drawn, which is far less often than samples are taken.
+latestStats = {}
+
+samplerThread = None
+# Samples several GPUs at once. Driver calls wait on the hardware rather than
+# the CPU and release the GIL, so per-device latencies overlap instead of adding up.
+samplerPool = None
+samplerStop = threading.Event()
+# Pipe written to by the sampler when a sample changes a displayed value, so
+# the UI can sleep in select() until there is something new to draw instead of
+# polling
+changeReader = None
+changeWriter = None
+samplerError = None
+
 
 def DetectHardware():
     print('Detecting Hardware...')
     global gpuDevices
     global cpuDevice
+    global gpuNames
     #GPU devices
     gpuDevices = ListAMDGPUDevices(False)
     gpuDevices.extend(ListNVIDIAGPUDevices())
     cpuDevice = GetCPUDevice()
+    gpuNames = [gpu.name for gpu in gpuDevices]
+
+
+def ValueOrNaN(value):
+    # Drivers report missing readings as None or an empty string
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def SampleAll():
+    """ Sample every device and publish the result as the latest stats.
+    Returns True if any value shown by DisplayStats changed.
+    """
+    global latestStats
+    # Sample every device in a single pass so drawing never waits on a driver call
+    if samplerPool is not None:
+        # list() waits for every device and re-raises the first failure
+        list(samplerPool.map(SampleDevice, gpuDevices))
+    else:
+        for gpu in gpuDevices:
+            gpu.Sample()
+    cpuDevice.Sample()
+
+    num_gpus = len(gpuDevices)
+    # One array for all readings, its rows are the per-reading arrays
+    latest = np.empty((5, num_gpus))
+    for i, gpu in enumerate(gpuDevices):
+        latest[:, i] = (gpu.gpu_usage.Latest(), gpu.vram_usage.Latest(), gpu.pcie_bw.Latest(),
+                        ValueOrNaN(gpu.temp), ValueOrNaN(gpu.fan))
+    stats = {'names': gpuNames}
+    stats['usage'], stats['vram'], stats['pcie_bw'], stats['temp'], stats['fan'] = latest
+    stats['pcie_bw_avg'] = ExponentialAverage(latestStats.get('pcie_bw_avg', np.full(num_gpus, np.nan)),
+                                              stats['pcie_bw'], PCIE_SMOOTHING)
+    # GPM metrics of NVIDIA GPUs that support them, None for other GPUs
+    stats['gpm'] = [getattr(gpu, 'gpm_metrics', None) for gpu in gpuDevices]
+    stats['cpu_usage'] = cpuDevice.cpu_usage.Latest()
+    shown = DisplayedValues(stats)
+    previous = latestStats.get('shown')
+    changed = previous is None or not np.array_equal(shown, previous, equal_nan=True)
+    stats['shown'] = shown
+    latestStats = stats
+    return changed
+
+
+def DisplayedValues(stats):
+    # Every value printed by DisplayStats, rounded once the way its format
+    # rounds it. Most samples leave all of them unchanged, and those need no
+    # redraw until the next idle redraw scrolls the graphs. NaN stands for a
+    # missing reading.
+    num_gpus = len(stats['names'])
+    shown = np.empty(7 * num_gpus + 1)
+    # One row per GPU reading, followed by the CPU usage
+    rows = shown[:-1].reshape(7, num_gpus)
+    rows[:5] = stats['usage'], stats['vram'], stats['pcie_bw_avg'], stats['temp'], stats['fan']
+    rows[5:] = np.nan
+    for i, metrics in enumerate(stats['gpm']):
+        if metrics:
+            rows[5:, i] = ValueOrNaN(metrics['sm_util']), ValueOrNaN(metrics['tensor_util'])
+    shown[-1] = stats['cpu_usage']
+    # %d truncates, %.0f rounds half to even
+    np.trunc(rows[:3], out=rows[:3])
+    np.rint(rows[3:], out=rows[3:])
+    np.trunc(shown[-1:], out=shown[-1:])
+    return shown
+
+
+def SampleDevice(gpu):
+    gpu.Sample()
+
+
+def SamplerLoop(period):
+    global samplerError
+    # Sleep until a fixed schedule rather than for a fixed time, so the cost
+    # of sampling does not stretch the interval between samples
+    next_tick = monotonic() + period
+    try:
+        while not samplerStop.is_set():
+            now = monotonic()
+            if next_tick > now:
+                if samplerStop.wait(next_tick - now):
+                    break
+                next_tick += period
+            else:
+                # Skip the ticks we missed instead of sampling in a burst to catch up
+                next_tick += period * ((now - next_tick) // period + 1)
+            if SampleAll():
+                NotifyChange()
+    except Exception as e:
+        samplerError = e
+        NotifyChange()
+
+
+def NotifyChange():
+    try:
+        os.write(changeWriter, b'\0')
+    except BlockingIOError:
+        # The pipe is full, so the UI already has a pending wakeup
+        pass
+
+
+def WaitForChange(timeout, fds=()):
+    """ Wait until the sampler publishes a sample that changes a displayed
+    value, one of fds becomes readable or timeout seconds pass. Returns True
+    if there is such a sample.
+    """
+    watched = list(fds)
+    if changeReader is not None:
+        watched.append(changeReader)
+    readable, _, _ = select.select(watched, [], [], timeout)
+    if changeReader is not None and changeReader in readable:
+        # Several samples may have been published since the last wakeup
+        os.read(changeReader, 4096)
+        return True
+    return False
+
+
+def StartSampler(period):
+    # Driver calls (NVML through ctypes, sysfs reads) release the GIL, so
+    # sampling on its own thread overlaps with drawing on the main thread
+    global samplerThread
+    global samplerPool
+    global changeReader
+    global changeWriter
+    changeReader, changeWriter = os.pipe()
+    os.set_blocking(changeWriter, False)
+    if len(gpuDevices) > 1:
+        samplerPool = ThreadPoolExecutor(max_workers=len(gpuDevices))
+    SampleAll()
+    samplerStop.clear()
+    samplerThread = threading.Thread(target=SamplerLoop, args=(period,), daemon=True)
+    samplerThread.start()
+    # The sampler only wakes the UI when a value differs from the first sample,
+    # so wake it once now for that sample to be drawn right away
+    NotifyChange()
+
+
+def StopSampler():
+    global samplerThread
+    global samplerPool
+    global changeReader
+    global changeWriter
+    if samplerThread is not None:
+        samplerStop.set()
+        samplerThread.join()
+        samplerThread = None
+    if samplerPool is not None:
+        samplerPool.shutdown()
+        samplerPool = None
+    if changeReader is not None:
+        os.close(changeReader)
+        os.close(changeWriter)
+        changeReader = None
+        changeWriter = None
+
+
+def GetLatestStats():
+    """ Latest readings of every device, with a copy of their histories. """
+    if samplerError is not None:
+        raise samplerError
+    stats = dict(latestStats)
+    # The histories may already hold a newer sample than the latest readings,
+    # which is never more than one sample period ahead
+    stats['usage_history'] = [gpu.gpu_usage.Values() for gpu in gpuDevices]
+    stats['vram_history'] = [gpu.vram_usage.Values() for gpu in gpuDevices]
+    stats['pcie_bw_history'] = [gpu.pcie_bw.Values() for gpu in gpuDevices]
+    stats['pcie_bw_max'] = [gpu.pcie_bw.Max() for gpu in gpuDevices]
+    stats['cpu_usage_history'] = cpuDevice.cpu_usage.Values()
+    return stats
+
+
+def ReleaseHardware():
+    StopSampler()
+    for gpu in gpuDevices:
+        gpu.Close()
+    ShutdownNVIDIAGPUDevices()
 
 
 
@@ -40,82 +247,44 @@ def PrintHardwareInfo():
     print('Mem:%5f MB' % cpuDevice.memory)
 
 
-def DrawGraph(title, y_data):
-    win.addch('\n')
-    win.addstr(title)
-    y=gpuDevices[i].gpu_usage
-    line = sparklines(y,num_lines=2, minimum=0, maximum=100)
-    win.addstr(line[0])
-    win.addch('\n')
-    win.addstr('%3d %%  ' % gpuDevices[i].gpu_usage[index])
-    win.addstr(line[1])
-
 def DisplayStats(win, curses):
-
-
+    addch = win.addch
+    color = curses.color_pair(1)
+    stats = GetLatestStats()
 
     # Draw GPU Info
-    for i in range(0, len(gpuDevices)):
-        index = gpuDevices[i].MAX_SAMPLES-1
-        gpuDevices[i].Sample()
-
-        
-        win.addstr('%s  TEMP:%3.0f C FAN: %2.0f %%' % (gpuDevices[i].name, gpuDevices[i].temp, gpuDevices[i].fan))
-        
-        
+    for name, temp, fan, usage, vram, pcie_bw, usage_history, vram_history, pcie_bw_history, pcie_bw_max, gpm in zip(
+            stats['names'], stats['temp'], stats['fan'], stats['usage'], stats['vram'], stats['pcie_bw_avg'],
+            stats['usage_history'], stats['vram_history'], stats['pcie_bw_history'], stats['pcie_bw_max'],
+            stats['gpm']):
+        win.addstr('%s  TEMP:%s FAN: %s' % (name, FormatValue(temp, 'temp'), FormatValue(fan, 'fan')))
+        if gpm:
+            win.addstr('  SM:%s TENSOR:%s' % (FormatValue(ValueOrNaN(gpm['sm_util']), 'util'),
+                                              FormatValue(ValueOrNaN(gpm['tensor_util']), 'util')))
+
         #gpu usage
-        win.addch('\n')
-        win.addstr('USAGE  ')
-        y=gpuDevices[i].gpu_usage
-        line = sparklines(y,num_lines=2, minimum=0, maximum=100)
-        win.addstr(line[0], curses.color_pair(1))
-        win.addch('\n')
-        win.addstr('%3d %%  ' % gpuDevices[i].gpu_usage[index])
-        win.addstr(line[1], curses.color_pair(1))
+        addch('\n')
+        DrawGraph(win, color, 'USAGE  ', usage_history, FormatValue(usage, 'percent'))
 
         #vram usage
-        #vram_size = 8 * 1024 * 1024 * 1024
-        win.addch('\n')
-        win.addch('\n')
-        win.addstr('VRAM   ')
-        y=gpuDevices[i].vram_usage
-        line = sparklines(y,num_lines=2, minimum=0, maximum=100)
-        win.addstr(line[0], curses.color_pair(1))
-        win.addch('\n')
-        win.addstr('%3d %%  ' % gpuDevices[i].vram_usage[index])
-        win.addstr(line[1], curses.color_pair(1))
- 
-        
+        addch('\n')
+        addch('\n')
+        DrawGraph(win, color, 'VRAM   ', vram_history, FormatValue(vram, 'percent'))
+
         #pcie bandwidth
-        win.addch('\n')
-        win.addch('\n')
-        win.addstr('PCIE    ')
-        y=gpuDevices[i].pcie_bw
-        line = sparklines(y,num_lines=2, minimum=0, maximum=100)
-        win.addstr(line[0], curses.color_pair(1))
-        win.addch('\n')
-        win.addstr('%3d MB/s' % gpuDevices[i].pcie_bw[index])
-        win.addstr(line[1], curses.color_pair(1))
-
-        win.addch('\n')
-        
+        addch('\n')
+        addch('\n')
+        # Scale to the recent peak once it exceeds 100 MB/s instead of clipping
+        DrawGraph(win, color, 'PCIE    ', pcie_bw_history, FormatValue(pcie_bw, 'bandwidth'),
+                  maximum=max(100, pcie_bw_max))
+
+        addch('\n')
+
     #Draw CPU stats
-    win.addch('\n')
-    win.addch('\n')
+    addch('\n')
+    addch('\n')
     win.addstr('%s' % cpuDevice.name)
-    win.addch('\n')
-    cpuDevice.Sample()
+    addch('\n')
 
-    index = cpuDevice.MAX_SAMPLES-1
-        
     #cpu usage
-    win.addstr('USAGE  ')
-    y=cpuDevice.cpu_usage
-    line = sparklines(y,num_lines=2, minimum=0, maximum=100)
-    win.addstr(line[0], curses.color_pair(1))
-    win.addch('\n')
-    win.addstr('%3d %%  ' % cpuDevice.cpu_usage[index])
-    win.addstr(line[1], curses.color_pair(1))
-    
-
-    
+    DrawGraph(win, color, 'USAGE  ', stats['cpu_usage_history'], FormatValue(stats['cpu_usage'], 'percent'))
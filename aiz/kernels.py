@@ -0,0 +1,15 @@
+# Uncompiled numeric kernels. aiz.fast picks the fastest available build of
+# them at import, while build_aot.py compiles them ahead of time. Importing
+# this module never triggers any compilation.
+import numpy as np
+
+
+def ExponentialAverage(average, values, alpha):
+    # A NaN average has no history yet and starts from the new value
+    return np.where(np.isnan(average), values, average + alpha * (values - average))
+
+
+# Kernels and their signatures, for build_aot.py
+KERNELS = {
+    'ExponentialAverage': (ExponentialAverage, 'f8[:](f8[:], f8[:], f8)'),
+}
@@ -0,0 +1,162 @@
+#=============================================
+# Bindings for the NVML GPU Performance Monitoring (GPM) API, which
+# py3nvml does not cover. GPM is available on Hopper and newer GPUs.
+# Layouts and values follow nvml.h.
+#=============================================
+
+from ctypes import Structure, POINTER, byref, c_uint, c_double, c_char_p
+from py3nvml.py3nvml import NVMLError, NVML_SUCCESS, _nvmlGetFunctionPointer, _nvmlCheckReturn
+
+
+NVML_GPM_METRICS_GET_VERSION = 1
+NVML_GPM_SUPPORT_VERSION = 1
+NVML_GPM_METRIC_MAX = 98
+
+NVML_GPM_METRIC_GRAPHICS_UTIL = 1
+NVML_GPM_METRIC_SM_UTIL = 2
+NVML_GPM_METRIC_SM_OCCUPANCY = 3
+NVML_GPM_METRIC_ANY_TENSOR_UTIL = 5
+NVML_GPM_METRIC_DRAM_BW_UTIL = 10
+NVML_GPM_METRIC_FP64_UTIL = 11
+NVML_GPM_METRIC_FP32_UTIL = 12
+NVML_GPM_METRIC_FP16_UTIL = 13
+NVML_GPM_METRIC_PCIE_TX_PER_SEC = 20
+NVML_GPM_METRIC_PCIE_RX_PER_SEC = 21
+NVML_GPM_METRIC_NVLINK_TOTAL_RX_PER_SEC = 60
+NVML_GPM_METRIC_NVLINK_TOTAL_TX_PER_SEC = 61
+
+# Metrics collected on every sample, by name. Utilizations are percentages,
+# PCIe and NVLink traffic is in MiB/s.
+GPM_METRICS = (
+    ('graphics_util', NVML_GPM_METRIC_GRAPHICS_UTIL),
+    ('sm_util', NVML_GPM_METRIC_SM_UTIL),
+    ('sm_occupancy', NVML_GPM_METRIC_SM_OCCUPANCY),
+    ('tensor_util', NVML_GPM_METRIC_ANY_TENSOR_UTIL),
+    ('dram_bw_util', NVML_GPM_METRIC_DRAM_BW_UTIL),
+    ('fp64_util', NVML_GPM_METRIC_FP64_UTIL),
+    ('fp32_util', NVML_GPM_METRIC_FP32_UTIL),
+    ('fp16_util', NVML_GPM_METRIC_FP16_UTIL),
+    ('pcie_tx', NVML_GPM_METRIC_PCIE_TX_PER_SEC),
+    ('pcie_rx', NVML_GPM_METRIC_PCIE_RX_PER_SEC),
+    ('nvlink_rx', NVML_GPM_METRIC_NVLINK_TOTAL_RX_PER_SEC),
+    ('nvlink_tx', NVML_GPM_METRIC_NVLINK_TOTAL_TX_PER_SEC),
+)
+
+
+class struct_c_nvmlGpmSample_t(Structure):
+    pass
+c_nvmlGpmSample_t = POINTER(struct_c_nvmlGpmSample_t)
+
+
+class c_nvmlGpmMetricInfo_t(Structure):
+    _fields_ = [
+        ('shortName', c_char_p),
+        ('longName', c_char_p),
+        ('unit', c_char_p),
+    ]
+
+
+class c_nvmlGpmMetric_t(Structure):
+    _fields_ = [
+        ('metricId', c_uint),
+        ('nvmlReturn', c_uint),
+        ('value', c_double),
+        ('metricInfo', c_nvmlGpmMetricInfo_t),
+    ]
+
+
+class c_nvmlGpmMetricsGet_t(Structure):
+    _fields_ = [
+        ('version', c_uint),
+        ('numMetrics', c_uint),
+        ('sample1', c_nvmlGpmSample_t),
+        ('sample2', c_nvmlGpmSample_t),
+        ('metrics', c_nvmlGpmMetric_t * NVML_GPM_METRIC_MAX),
+    ]
+
+
+class c_nvmlGpmSupport_t(Structure):
+    _fields_ = [
+        ('version', c_uint),
+        ('isSupportedDevice', c_uint),
+    ]
+
+
+def nvmlGpmQueryDeviceSupport(device):
+    support = c_nvmlGpmSupport_t()
+    support.version = NVML_GPM_SUPPORT_VERSION
+    fn = _nvmlGetFunctionPointer('nvmlGpmQueryDeviceSupport')
+    _nvmlCheckReturn(fn(device, byref(support)))
+    return bool(support.isSupportedDevice)
+
+
+def nvmlGpmSampleAlloc():
+    sample = c_nvmlGpmSample_t()
+    fn = _nvmlGetFunctionPointer('nvmlGpmSampleAlloc')
+    _nvmlCheckReturn(fn(byref(sample)))
+    return sample
+
+
+def nvmlGpmSampleFree(sample):
+    fn = _nvmlGetFunctionPointer('nvmlGpmSampleFree')
+    _nvmlCheckReturn(fn(sample))
+
+
+def nvmlGpmSampleGet(device, sample):
+    fn = _nvmlGetFunctionPointer('nvmlGpmSampleGet')
+    _nvmlCheckReturn(fn(device, sample))
+
+
+def nvmlGpmMetricsGet(metricsGet):
+    fn = _nvmlGetFunctionPointer('nvmlGpmMetricsGet')
+    _nvmlCheckReturn(fn(byref(metricsGet)))
+    return metricsGet
+
+
+def IsGpmSupported(device):
+    # Older drivers do not export the GPM entry points at all
+    try:
+        return nvmlGpmQueryDeviceSupport(device)
+    except NVMLError:
+        return False
+
+
+class GpmSampler:
+    """ Collect every metric of GPM_METRICS for one device with a single
+    nvmlGpmMetricsGet call. GPM metrics are computed between two samples, so
+    the first call to Sample() only takes the baseline and returns None.
+    """
+    def __init__(self, device):
+        self.device = device
+        self.samples = [nvmlGpmSampleAlloc(), nvmlGpmSampleAlloc()]
+        self.current = 0
+        self.primed = False
+        # The request structure is filled once and reused on every sample
+        self.metricsGet = c_nvmlGpmMetricsGet_t()
+        self.metricsGet.version = NVML_GPM_METRICS_GET_VERSION
+        self.metricsGet.numMetrics = len(GPM_METRICS)
+        for i, (name, metricId) in enumerate(GPM_METRICS):
+            self.metricsGet.metrics[i].metricId = metricId
+
+    def Sample(self):
+        previous = self.samples[self.current]
+        self.current ^= 1
+        current = self.samples[self.current]
+        nvmlGpmSampleGet(self.device, current)
+        if not self.primed:
+            self.primed = True
+            return None
+
+        self.metricsGet.sample1 = previous
+        self.metricsGet.sample2 = current
+        nvmlGpmMetricsGet(self.metricsGet)
+        metrics = {}
+        for i, (name, metricId) in enumerate(GPM_METRICS):
+            metric = self.metricsGet.metrics[i]
+            metrics[name] = metric.value if metric.nvmlReturn == NVML_SUCCESS else None
+        return metrics
+
+    def Close(self):
+        for sample in self.samples:
+            nvmlGpmSampleFree(sample)
+        self.samples = []
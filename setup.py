@@ -1,8 +1,30 @@
+import os
 import setuptools
 
 with open("README.md", "r") as fh:
     long_description = fh.read()
 
+# Optionally compile the per-frame drawing helpers with mypyc. The compilers
+# are opt-in and not declared as build requirements, so pip must be run with
+# --no-build-isolation to see the ones installed in the current environment.
+ext_modules = []
+if os.environ.get("AIZ_USE_MYPYC") == "1":
+    try:
+        from mypyc.build import mypycify
+    except ImportError:
+        raise SystemExit("AIZ_USE_MYPYC=1 requires mypy in the build environment: "
+                         "pip3 install mypy, then pip3 install --no-build-isolation .")
+    ext_modules = mypycify(["aiz/display.py"])
+
+# Optionally compile the per-sample numeric kernels ahead of time with Numba
+if os.environ.get("AIZ_USE_NUMBA_AOT") == "1":
+    try:
+        from aiz.build_aot import cc
+    except ImportError:
+        raise SystemExit("AIZ_USE_NUMBA_AOT=1 requires numba in the build environment: "
+                         "pip3 install numba, then pip3 install --no-build-isolation .")
+    ext_modules.append(cc.distutils_extension())
+
 setuptools.setup(
     name="ai-z",
     version="0.3.1",
@@ -15,6 +37,7 @@ setuptools.setup(
     url="https://www.ai-z.org",
     install_requires=['py3nvml','numpy','psutil','py-cpuinfo','sparklines'],
     packages=setuptools.find_packages(),
+    ext_modules=ext_modules,
     scripts=['bin/ai-z'],
     classifiers=[
         "Programming Language :: Python :: 3",
@@ -0,0 +1,14 @@
+from aiz.display import FormatValue
+
+
+def test_format_value():
+    assert FormatValue(55.0, 'temp') == ' 55 C'
+    assert FormatValue(42, 'percent') == ' 42 %  '
+    assert FormatValue(12.7, 'bandwidth') == ' 12 MB/s'
+
+
+def test_format_value_nan_uses_same_width_placeholder():
+    nan = float('nan')
+    for kind in ['percent', 'bandwidth', 'temp', 'fan', 'util']:
+        assert '-' in FormatValue(nan, kind)
+        assert len(FormatValue(nan, kind)) == len(FormatValue(1, kind))
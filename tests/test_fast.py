@@ -0,0 +1,14 @@
+import numpy as np
+
+from aiz.fast import ExponentialAverage
+
+
+def test_exponential_average_seeds_from_nan():
+    average = ExponentialAverage(np.array([np.nan, np.nan]), np.array([5.0, 20.0]), 0.1)
+    assert list(average) == [5.0, 20.0]
+
+
+def test_exponential_average_moves_towards_new_values():
+    average = ExponentialAverage(np.array([np.nan, 10.0]), np.array([5.0, 20.0]), 0.1)
+    assert average[0] == 5.0
+    assert np.isclose(average[1], 11.0)
@@ -0,0 +1,106 @@
+import os
+
+import pytest
+
+import aiz.gpu_amd
+from aiz.gpu_amd import ListAMDGPUDevices
+
+DEVICE_FILES = {
+    'vendor': '0x1002\n',
+    'device': '0x73bf\n',
+    'power_dpm_force_performance_level': 'auto\n',
+    'gpu_busy_percent': '42\n',
+    'mem_info_vram_used': '2147483648\n',
+    'mem_info_vram_total': '8589934592\n',
+    # Packets received, packets sent and their maximum size in bytes
+    'pcie_bw': '1024 2048 256\n',
+}
+HWMON_FILES = {
+    'name': 'amdgpu\n',
+    'temp1_input': '55000\n',
+    'pwm1': '128\n',
+    'pwm1_max': '255\n',
+}
+
+
+def WriteFiles(directory, files):
+    for name, contents in files.items():
+        (directory / name).write_text(contents)
+
+
+@pytest.fixture
+def sysfs(tmp_path, monkeypatch):
+    """ Fake /sys/class/drm and /sys/class/hwmon trees holding one AMD GPU.
+    Returns the directories of its DRM device and its HW Monitor.
+    """
+    device = tmp_path / 'devices' / '0000:03:00.0'
+    device.mkdir(parents=True)
+    WriteFiles(device, DEVICE_FILES)
+    drm = tmp_path / 'drm'
+    (drm / 'card0').mkdir(parents=True)
+    (drm / 'card0' / 'device').symlink_to(device)
+    hwmon = tmp_path / 'hwmon' / 'hwmon0'
+    hwmon.mkdir(parents=True)
+    WriteFiles(hwmon, HWMON_FILES)
+    (hwmon / 'device').symlink_to(device)
+
+    # valuePaths holds its own copy of the prefixes
+    prefixes = {aiz.gpu_amd.drmprefix: str(drm), aiz.gpu_amd.hwmonprefix: str(tmp_path / 'hwmon')}
+    for key, pathDict in aiz.gpu_amd.valuePaths.items():
+        if pathDict['prefix'] in prefixes:
+            monkeypatch.setitem(aiz.gpu_amd.valuePaths, key, dict(pathDict, prefix=prefixes[pathDict['prefix']]))
+    monkeypatch.setattr(aiz.gpu_amd, 'drmprefix', str(drm))
+    monkeypatch.setattr(aiz.gpu_amd, 'hwmonprefix', str(tmp_path / 'hwmon'))
+    monkeypatch.setattr(aiz.gpu_amd, 'hwmonCache', {})
+    return device, hwmon
+
+
+def test_sample_parses_sysfs_bytes(sysfs):
+    [gpu] = ListAMDGPUDevices(False)
+    assert gpu.id == '73bf'
+    assert gpu.perf == 'auto'
+    assert gpu.gpu_usage.Latest() == 42
+    assert gpu.vram_usage.Latest() == 25
+    assert gpu.pcie_bw.Latest() == (1024 + 2048) * 256 / 1024.0 / 1024.0
+    assert gpu.fan == pytest.approx(128 / 255 * 100)
+    assert gpu.temp == 55.0
+    gpu.Close()
+
+
+def test_sample_rereads_open_files(sysfs):
+    device, hwmon = sysfs
+    [gpu] = ListAMDGPUDevices(False)
+    (device / 'gpu_busy_percent').write_text('7\n')
+    (hwmon / 'temp1_input').write_text('61500\n')
+    gpu.Sample()
+    assert gpu.gpu_usage.Latest() == 7
+    assert gpu.temp == 61.5
+    gpu.Close()
+
+
+def test_missing_fan_and_temperature_read_as_none(sysfs):
+    device, hwmon = sysfs
+    (hwmon / 'pwm1_max').unlink()
+    (hwmon / 'temp1_input').unlink()
+    [gpu] = ListAMDGPUDevices(False)
+    assert gpu.fan is None
+    assert gpu.temp is None
+    gpu.Close()
+
+    # Without the fan level itself the fan is missing as well
+    (hwmon / 'pwm1').unlink()
+    WriteFiles(hwmon, {'pwm1_max': '255\n'})
+    [gpu] = ListAMDGPUDevices(False)
+    assert gpu.fan is None
+    gpu.Close()
+
+
+def test_close_releases_descriptors(sysfs):
+    [gpu] = ListAMDGPUDevices(False)
+    fds = list(gpu.fds.values())
+    assert len(fds) == len(gpu.SAMPLED_KEYS)
+    gpu.Close()
+    assert gpu.fds == {}
+    for fd in fds:
+        with pytest.raises(OSError):
+            os.fstat(fd)
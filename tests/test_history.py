@@ -0,0 +1,31 @@
+from aiz.history import SampleHistory
+
+
+def test_values_start_as_zeros():
+    history = SampleHistory(3)
+    assert list(history.Values()) == [0, 0, 0]
+    assert history.Max() == 0.0
+
+
+def test_values_are_oldest_to_newest_before_wrapping():
+    history = SampleHistory(4)
+    history.Append(1)
+    history.Append(2)
+    assert list(history.Values()) == [0, 0, 1, 2]
+    assert history.Latest() == 2
+
+
+def test_values_and_max_after_wrapping():
+    history = SampleHistory(3)
+    for value in [9, 1, 2, 3, 4]:
+        history.Append(value)
+    assert list(history.Values()) == [2, 3, 4]
+    assert history.Latest() == 4
+    # The 9 was overwritten and no longer counts towards the peak
+    assert history.Max() == 4.0
+
+
+def test_max_ignores_unfilled_slots():
+    history = SampleHistory(4)
+    history.Append(-5)
+    assert history.Max() == -5.0
@@ -0,0 +1,145 @@
+from ctypes import addressof
+from types import SimpleNamespace
+
+import aiz.gpu_nvidia
+import aiz.nvml_gpm
+from aiz.gpu_nvidia import AIZGPU_NVIDIA
+from aiz.nvml_gpm import (GPM_METRICS, NVML_GPM_METRICS_GET_VERSION, NVML_GPM_METRIC_FP64_UTIL, GpmSampler,
+                          NVMLError, struct_c_nvmlGpmSample_t)
+
+NVML_ERROR_NOT_SUPPORTED = 3
+
+
+class FakeGpmLibrary:
+    """ Stands in for the GPM entry points of libnvidia-ml. Every metric
+    reports twice its ID, except FP64 utilization which is not supported.
+    """
+    def __init__(self):
+        self.allocated = []
+        self.freed = []
+        self.sampled = []
+        self.compared = []
+
+    def nvmlGpmSampleAlloc(self, sample):
+        buffer = struct_c_nvmlGpmSample_t()
+        self.allocated.append(buffer)
+        sample._obj.contents = buffer
+        return 0
+
+    def nvmlGpmSampleFree(self, sample):
+        self.freed.append(addressof(sample.contents))
+        return 0
+
+    def nvmlGpmSampleGet(self, device, sample):
+        self.sampled.append(addressof(sample.contents))
+        return 0
+
+    def nvmlGpmMetricsGet(self, metricsGet):
+        request = metricsGet._obj
+        self.compared.append((addressof(request.sample1.contents), addressof(request.sample2.contents)))
+        for i in range(request.numMetrics):
+            metric = request.metrics[i]
+            if metric.metricId == NVML_GPM_METRIC_FP64_UTIL:
+                metric.nvmlReturn = NVML_ERROR_NOT_SUPPORTED
+            else:
+                metric.nvmlReturn = 0
+                metric.value = metric.metricId * 2.0
+        return 0
+
+
+def UseFakeLibrary(monkeypatch):
+    library = FakeGpmLibrary()
+    monkeypatch.setattr(aiz.nvml_gpm, '_nvmlGetFunctionPointer', lambda name: getattr(library, name))
+    return library
+
+
+def test_metrics_request_is_filled_once(monkeypatch):
+    UseFakeLibrary(monkeypatch)
+    request = GpmSampler('gpu0').metricsGet
+    assert request.version == NVML_GPM_METRICS_GET_VERSION
+    assert request.numMetrics == len(GPM_METRICS)
+    assert [request.metrics[i].metricId for i in range(len(GPM_METRICS))] == [id for name, id in GPM_METRICS]
+
+
+def test_first_sample_is_baseline_and_samples_alternate(monkeypatch):
+    library = UseFakeLibrary(monkeypatch)
+    sampler = GpmSampler('gpu0')
+    first, second = [addressof(buffer) for buffer in library.allocated]
+
+    assert sampler.Sample() is None
+    assert library.compared == []
+    assert sampler.Sample() is not None
+    assert sampler.Sample() is not None
+    assert library.sampled == [second, first, second]
+    assert library.compared == [(second, first), (first, second)]
+
+    sampler.Close()
+    assert library.freed == [first, second]
+
+
+def test_unsupported_metric_is_none(monkeypatch):
+    UseFakeLibrary(monkeypatch)
+    sampler = GpmSampler('gpu0')
+    sampler.Sample()
+    metrics = sampler.Sample()
+    assert metrics['fp64_util'] is None
+    assert metrics['sm_util'] == 4.0
+    assert metrics['pcie_tx'] == 40.0
+
+
+class FailingGpmSampler:
+    def __init__(self, device):
+        self.closed = False
+
+    def Sample(self):
+        raise NVMLError(NVML_ERROR_NOT_SUPPORTED)
+
+    def Close(self):
+        self.closed = True
+
+
+def UseFakeDevice(monkeypatch):
+    # PCIe counters report 1 MiB/s of TX and 2 MiB/s of RX, in KiB/s
+    throughput = {aiz.gpu_nvidia.NVML_PCIE_UTIL_TX_BYTES: 1024, aiz.gpu_nvidia.NVML_PCIE_UTIL_RX_BYTES: 2048}
+    for name, value in [
+            ('nvmlDeviceGetName', lambda device: 'Fake GPU'),
+            ('nvmlDeviceGetMemoryInfo', lambda device: SimpleNamespace(total=1000, used=250)),
+            ('nvmlDeviceGetMaxPcieLinkGeneration', lambda device: 5),
+            ('nvmlDeviceGetMaxPcieLinkWidth', lambda device: 16),
+            ('nvmlDeviceGetUtilizationRates', lambda device: SimpleNamespace(gpu=42)),
+            ('nvmlDeviceGetPcieThroughput', lambda device, counter: throughput[counter]),
+            ('nvmlDeviceGetTemperature', lambda device, sensor: 55),
+            ('nvmlDeviceGetFanSpeed', lambda device: 30),
+            ('IsGpmSupported', lambda device: True)]:
+        monkeypatch.setattr(aiz.gpu_nvidia, name, value)
+
+
+def test_failing_gpm_falls_back_to_pcie_counters(monkeypatch):
+    UseFakeDevice(monkeypatch)
+    samplers = []
+
+    def CreateSampler(device):
+        samplers.append(FailingGpmSampler(device))
+        return samplers[-1]
+
+    monkeypatch.setattr(aiz.gpu_nvidia, 'GpmSampler', CreateSampler)
+    gpu = AIZGPU_NVIDIA('gpu0')
+    assert samplers[0].closed
+    assert gpu.gpm is None
+    assert gpu.gpm_metrics is None
+    assert gpu.pcie_bw.Latest() == 3.0
+    # Later samples keep using the counters
+    gpu.Sample()
+    assert gpu.pcie_bw.Latest() == 3.0
+
+
+def test_gpm_pcie_traffic_replaces_counters(monkeypatch):
+    UseFakeDevice(monkeypatch)
+    UseFakeLibrary(monkeypatch)
+    gpu = AIZGPU_NVIDIA('gpu0')
+    # The constructor's sample only takes the GPM baseline
+    assert gpu.pcie_bw.Latest() == 3.0
+    gpu.Sample()
+    assert gpu.pcie_bw.Latest() == 40.0 + 42.0
+    gpu.Close()
+    assert gpu.gpm is None